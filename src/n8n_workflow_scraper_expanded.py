@@ -37,7 +37,7 @@ ESTRATEGIA EXPANDIDA:
 - Fase 1: Mapear todas las categorías y subcategorías
 - Fase 2: Para cada categoría/subcategoría:
   * Recopilar todos los workflows
-  * Cargar todas las páginas ("Load more templates")
+  * Recorrer todas las páginas (?count=30&page=N)
   * Descargar cada 15 workflows encontrados
 - Fase 3: Estadísticas completas por categoría
 
@@ -46,37 +46,267 @@ Fecha: Enero 2025
 Versión: 3.1 (CONTEO DE NODOS MEJORADO)
 """
 
+import os
 import json
+import math
+import argparse
 import re
+import sys
 import time
+import queue
+import asyncio
+import logging
 import pathlib
-from typing import List, Optional, Dict, Any, Set, Tuple
-from playwright.sync_api import sync_playwright, Page, Browser, BrowserContext
+import threading
+import collections
+import orjson
+import aiohttp
+from contextlib import asynccontextmanager
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener
+from types import MappingProxyType
+from typing import AsyncIterator, Awaitable, Callable, List, Mapping, Optional, Dict, Any, Set, Tuple
+from playwright.async_api import async_playwright, Page, Browser, BrowserContext, Locator
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from urllib.parse import urljoin, urlparse
 
 
+# Expresiones regulares precompiladas (usadas por cada tarjeta de workflow)
+_SLUG_RE = re.compile(r'/workflows/(\d+-[^/]+)')
+_PLUS_RE = re.compile(r'\+(\d+)')
+_NODES_RES = (
+    re.compile(r'(\d+)\s*nodes?', re.I),  # "5 nodes" o "5 node"
+    re.compile(r'(\d+)\s*nodos?', re.I),  # "5 nodos" o "5 nodo"
+)
+
+# Enlaces a workflows individuales (/workflows/<id>-...): CSS no admite regex en
+# atributos, así que se enumera el primer dígito del id. Los enlaces de navegación
+# (/workflows/, /workflows/categories/...) no coinciden
+_WORKFLOW_CARD_SELECTOR = ", ".join(f"a[href*='/workflows/{digit}']" for digit in range(10))
+
+# Extracción de tarjetas en el navegador: un único page.evaluate recorre el DOM
+# y devuelve los datos de todas las tarjetas, en lugar de varias llamadas CDP
+# (query_selector / get_attribute / inner_text) por cada tarjeta.
+_EXTRACT_CARDS_JS = """
+() => {
+    const out = [];
+    const anchors = document.querySelectorAll("a[href*='/workflows/']:not([href*='/workflows/categories/'])");
+    for (const a of anchors) {
+        // Solo workflows individuales (/workflows/<id>-...), antes de cualquier otro trabajo
+        const href = a.getAttribute('href');
+        if (!href || !/\\/workflows\\/\\d+/.test(href)) continue;
+        const ul = a.querySelector('ul');
+        let visible = 0;
+        let plus = 0;
+        if (ul) {
+            for (const li of ul.querySelectorAll('li')) {
+                if (li.querySelector('[role="tooltip"]')) visible++;
+            }
+            for (const span of ul.querySelectorAll('li span:not([role])')) {
+                const m = /\\+(\\d+)/.exec((span.innerText || '').trim());
+                if (m) { plus = parseInt(m[1], 10); break; }
+            }
+        }
+        const title = a.querySelector('h3, .workflow-title, [class*="title"]');
+        const txt = a.innerText || '';
+        out.push({
+            href: href,
+            title: title ? title.innerText.trim() : '',
+            hasNodeList: !!ul,
+            visible: visible,
+            plus: plus,
+            hasPrice: /[$€£]\\s*\\d/.test(txt),
+            isFree: /\\bfree\\b/i.test(txt),
+            text: txt
+        });
+    }
+    return out;
+}
+"""
+
+# CATEGORÍAS PRINCIPALES CONOCIDAS (EXCLUYENDO AI - ya procesada)
+# Constantes inmutables a nivel de módulo: no se reconstruyen en cada llamada
+_KNOWN_CATEGORIES: Tuple[Mapping[str, str], ...] = (
+    MappingProxyType({'name': 'Sales', 'slug': 'sales', 'url': 'https://n8n.io/workflows/categories/sales/'}),
+    MappingProxyType({'name': 'IT Ops', 'slug': 'it-ops', 'url': 'https://n8n.io/workflows/categories/it-ops/'}),
+    MappingProxyType({'name': 'Marketing', 'slug': 'marketing', 'url': 'https://n8n.io/workflows/categories/marketing/'}),
+    MappingProxyType({'name': 'Document Ops', 'slug': 'document-ops', 'url': 'https://n8n.io/workflows/categories/document-ops/'}),
+    MappingProxyType({'name': 'Other', 'slug': 'other', 'url': 'https://n8n.io/workflows/categories/other/'}),
+    MappingProxyType({'name': 'Support', 'slug': 'support', 'url': 'https://n8n.io/workflows/categories/support/'})
+)
+
+# SUBCATEGORÍAS HARDCODEADAS basadas en investigación exhaustiva con MCP Playwright
+# Datos obtenidos de análisis JavaScript DOM en cada categoría principal
+_KNOWN_SUBCATEGORIES: Mapping[str, Tuple[Mapping[str, str], ...]] = MappingProxyType({
+    'sales': (
+        MappingProxyType({'name': 'CRM', 'slug': 'crm', 'url': 'https://n8n.io/workflows/categories/crm/'}),
+        MappingProxyType({'name': 'Lead Generation', 'slug': 'lead-generation', 'url': 'https://n8n.io/workflows/categories/lead-generation/'}),
+        MappingProxyType({'name': 'Lead Nurturing', 'slug': 'lead-nurturing', 'url': 'https://n8n.io/workflows/categories/lead-nurturing/'})
+    ),
+    'marketing': (
+        MappingProxyType({'name': 'Content Creation', 'slug': 'content-creation', 'url': 'https://n8n.io/workflows/categories/content-creation/'}),
+        MappingProxyType({'name': 'Market Research', 'slug': 'market-research', 'url': 'https://n8n.io/workflows/categories/market-research/'}),
+        MappingProxyType({'name': 'Social Media', 'slug': 'social-media', 'url': 'https://n8n.io/workflows/categories/social-media/'})
+    ),
+    'it-ops': (
+        MappingProxyType({'name': 'SecOps', 'slug': 'secops', 'url': 'https://n8n.io/workflows/categories/secops/'}),
+        MappingProxyType({'name': 'Engineering', 'slug': 'engineering', 'url': 'https://n8n.io/workflows/categories/engineering/'}),
+        MappingProxyType({'name': 'DevOps', 'slug': 'devops', 'url': 'https://n8n.io/workflows/categories/devops/'})
+    ),
+    'document-ops': (
+        MappingProxyType({'name': 'Document Extraction', 'slug': 'document-extraction', 'url': 'https://n8n.io/workflows/categories/document-extraction/'}),
+        MappingProxyType({'name': 'File Management', 'slug': 'file-management', 'url': 'https://n8n.io/workflows/categories/file-management/'}),
+        MappingProxyType({'name': 'Invoice Processing', 'slug': 'invoice-processing', 'url': 'https://n8n.io/workflows/categories/invoice-processing/'})
+    ),
+    'support': (
+        MappingProxyType({'name': 'Support Chatbot', 'slug': 'support-chatbot', 'url': 'https://n8n.io/workflows/categories/support-chatbot/'}),
+        MappingProxyType({'name': 'Ticket Management', 'slug': 'ticket-management', 'url': 'https://n8n.io/workflows/categories/ticket-management/'}),
+        MappingProxyType({'name': 'Internal Wiki', 'slug': 'internal-wiki', 'url': 'https://n8n.io/workflows/categories/internal-wiki/'})
+    ),
+    'other': (
+        MappingProxyType({'name': 'Crypto Trading', 'slug': 'crypto-trading', 'url': 'https://n8n.io/workflows/categories/crypto-trading/'}),
+        MappingProxyType({'name': 'HR', 'slug': 'hr', 'url': 'https://n8n.io/workflows/categories/hr/'}),
+        MappingProxyType({'name': 'Miscellaneous', 'slug': 'miscellaneous', 'url': 'https://n8n.io/workflows/categories/miscellaneous/'}),
+        MappingProxyType({'name': 'Personal Productivity', 'slug': 'personal-productivity', 'url': 'https://n8n.io/workflows/categories/personal-productivity/'}),
+        MappingProxyType({'name': 'Project Management', 'slug': 'project-management', 'url': 'https://n8n.io/workflows/categories/project-management/'})
+    )
+})
+
+
+class _RetryableStatusError(Exception):
+    """Respuesta HTTP transitoria (429 o 5xx): merece reintento con backoff"""
+
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class _TokenBucket:
+    """Limitador token bucket para asyncio: `rate` peticiones por segundo con ráfagas de
+    hasta `rate` peticiones (un segundo de crédito acumulado)"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated: Optional[float] = None
+
+    async def acquire(self) -> None:
+        """Espera hasta que haya un token disponible y lo consume"""
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if self.updated is not None:
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            
+            # Sin await entre la comprobación y el consumo: no hay carreras en el bucle de eventos
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
 class N8NComprehensiveWorkflowScraper:
     """Scraper expandido para exploración masiva de todas las categorías"""
 
     # URLs base
     BASE_URL = "https://n8n.io/workflows/"
     CATEGORIES_PAGE = "https://n8n.io/workflows/"
+    # API pública de plantillas: devuelve el JSON del workflow sin renderizar la página
+    TEMPLATES_API_URL = "https://api.n8n.io/api/templates/workflows/{id}"
+    TEMPLATES_SEARCH_API_URL = "https://api.n8n.io/api/templates/search"
     
     # Configuración
     MIN_NODES = 6  
     SLOW_MO = 750  # Reducido para mayor velocidad
     TIMEOUT = 30000  # Aumentado a 30s para mejor conectividad
-    MAX_TABS = 8
+    READY_TIMEOUT = 15000  # Espera máxima a que aparezca un elemento tras domcontentloaded
+    CATEGORY_CONCURRENCY = 4  # Subcategorías procesadas en paralelo (una pestaña cada una)
     DOWNLOAD_BATCH_SIZE = 15
+    DOWNLOAD_CONCURRENCY = 4  # Descargas simultáneas por lote
+    TAB_POOL_SIZE = 4  # Pestañas de descarga compartidas por todas las subcategorías
+    HTTP_MAX_CONNECTIONS = 8  # Conexiones keep-alive del cliente HTTP de la API
+    HOST_CONCURRENCY = 4  # Peticiones simultáneas máximas contra un mismo host
+    REQUESTS_PER_SECOND = 10.0  # Token bucket por host (por defecto; se cambia con env N8N_RPS)
+    MAX_BACKOFF_RETRIES = 3  # Reintentos ante errores transitorios (429, 5xx, timeouts, red)
+    BACKOFF_BASE = 2.0  # Espera inicial (s) del backoff exponencial
+    BACKOFF_MAX = 10.0  # Espera máxima (s) entre reintentos
+    # Errores que se reintentan; el resto (JSON inválido, 404...) falla a la primera
+    TRANSIENT_ERRORS = (asyncio.TimeoutError, aiohttp.ClientError, PlaywrightTimeoutError, _RetryableStatusError)
     EXPLORATION_TABS = 2
+    LOG_LEVEL = "INFO"  # "DEBUG" para ver el detalle de cada tarjeta
+    LOG_FILE = "logs/scraper.log"  # Relativo a download_dir, no al directorio actual
+    PROGRESS_LOG_EVERY = 10  # Registrar el progreso de descarga cada N éxitos
+    USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
     
     # Configuración específica para diferentes páginas
     WORKFLOWS_PER_PAGE = 30  # Para subcategorías usamos ?count=30
     MAX_WORKFLOWS_PER_SUBCATEGORY = 150  # Límite máximo por subcategoría
-
-    def __init__(self, download_dir: str = "Workflow Scraper"):
+    MAX_PAGES = 30  # Límite de seguridad de páginas por subcategoría
+    
+    # Recursos bloqueados: solo necesitamos el DOM y el JSON de los workflows
+    # (document, script, xhr y fetch se dejan pasar: las tarjetas y la API dependen de ellos)
+    BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media", "stylesheet", "texttrack", "manifest", "ping"})
+    # Se comparan solo con el host: los slugs de workflows nombran estos mismos servicios
+    # (p. ej. /workflows/1234-sync-intercom-contacts-to-hubspot/)
+    BLOCKED_HOST_KEYWORDS = (
+        "google-analytics", "googletagmanager", "doubleclick",
+        "hotjar", "segment.io", "segment.com", "posthog", "clarity.ms", "facebook.net", "hs-scripts", "intercom"
+    )
+    _BLOCKED_HOST_RE = re.compile("|".join(map(re.escape, BLOCKED_HOST_KEYWORDS)))
+    
+    # Selectores del botón de aceptar cookies (se combinan en un solo locator)
+    COOKIE_ACCEPT_SELECTORS = (
+        "button:has-text('Accept All')",
+        "button:has-text('Accept')",
+        "[data-testid='cookie-accept-all']",
+        ".cookie-accept-all",
+        "#cookie-accept-all",
+        ".cookiescript_accept_all",
+        "button[class*='accept']",
+        "div[class*='accept'][role='button']",
+    )
+    
+    # Estado del navegador (cookies/localStorage) reutilizado entre ejecuciones
+    STORAGE_STATE_FILE = "_storage.json"
+    CONSENT_COOKIE_MARKER = "cookiescript"  # Cookie del banner de consentimiento
+    
+    # Caché en disco de las categorías principales descubiertas
+    CATEGORY_CACHE_FILE = "_category_cache.json"
+    CATEGORY_CACHE_TTL = 24 * 60 * 60  # 24 horas
+    WORKFLOW_CACHE_TTL = 24 * 60 * 60  # Workflows descargados hace menos de 24h no se vuelven a pedir
+    
+    # Usar directamente la lista conocida de categorías en lugar de navegar a
+    # la página principal (la lista hardcodeada es la referencia del proyecto)
+    USE_HARDCODED_CATEGORIES: bool = True
+    
+    def __init__(self, download_dir: str = "Workflow Scraper", force_rescrape: bool = False,
+                 requests_per_second: Optional[float] = None):
+        # Un ritmo de 0 divide por cero en el token bucket y uno negativo lo deja girando sin esperar
+        if requests_per_second is None:
+            requests_per_second = self.REQUESTS_PER_SECOND
+        if not (math.isfinite(requests_per_second) and requests_per_second > 0):
+            raise ValueError(f"requests_per_second debe ser un número finito mayor que 0 (recibido: {requests_per_second})")
+        self.requests_per_second = requests_per_second
+        
         self.download_dir = pathlib.Path(download_dir)
         self.download_dir.mkdir(exist_ok=True)
+        self.force_rescrape = force_rescrape
+        
+        # Logging en segundo plano: los hilos encolan los registros y un
+        # QueueListener los escribe en stdout y en LOG_FILE (un único orden para ambos loggers).
+        # El fichero va detrás de un MemoryHandler para escribir por bloques, y no se abre
+        # hasta el primer volcado (delay): crear el scraper sin ejecutarlo no deja handles abiertos
+        log_file = self.download_dir / self.LOG_FILE
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        self._log_file_handler = logging.FileHandler(log_file, encoding='utf-8', delay=True)
+        file_handler = MemoryHandler(200, flushLevel=logging.ERROR, target=self._log_file_handler)
+        
+        self._log_queue = queue.Queue()
+        self._logger = self._create_logger("n8n_scraper", self.LOG_LEVEL, "[%(asctime)s] [%(levelname)s] %(message)s")
+        self._report_logger = self._create_logger("n8n_scraper.report", "INFO", "%(message)s")
+        self._log_listener = QueueListener(self._log_queue, logging.StreamHandler(sys.stdout), file_handler)
+        self._log_listener.start()
         
         # Estadísticas globales
         self.global_stats = {
@@ -85,105 +315,273 @@ class N8NComprehensiveWorkflowScraper:
             'total_workflows_found': 0,
             'total_workflows_downloaded': 0,
             'total_errors': 0,
+            'cache_hits': 0,
             'start_time': time.time()
         }
         
         # Estadísticas por categoría
         self.category_stats = {}
         
+        # Contadores de descarga por (categoría, métrica): se vuelcan en category_stats al final
+        self._stats_counter = collections.Counter()
+        
         # Conjuntos para evitar duplicados
         self.processed_urls = set()
-        self.downloaded_slugs = set()
+        # Workflows ya guardados, por (directorio de categoría, id numérico de la plantilla):
+        # el mismo workflow listado en dos subcategorías debe guardarse en ambas, y el id
+        # es lo único común a los nombres de archivo del listado por DOM y por API
+        self.downloaded_workflows: Set[Tuple[str, str]] = set()
+        
+        # Índice en memoria de los workflows descargados recientemente (evita un stat
+        # por workflow); con force_rescrape se vuelve a descargar todo
+        if not self.force_rescrape:
+            now = time.time()
+            for workflow_file in self.download_dir.glob('*/*.json'):
+                if now - workflow_file.stat().st_mtime < self.WORKFLOW_CACHE_TTL:
+                    self.downloaded_workflows.add((workflow_file.parent.name, workflow_file.stem.split('-', 1)[0]))
+        
+        # Pestañas de descarga reutilizables (el pool se crea dentro del bucle de eventos, en la fase 2)
+        self.tab_pool: Optional["asyncio.Queue[Page]"] = None
+        # Las cookies del contexto del pool se aceptan en el primer préstamo (solo si algún
+        # workflow necesita el portapapeles); el lock se crea junto al pool
+        self._pool_cookies_lock: Optional[asyncio.Lock] = None
+        self._pool_cookies_ready = False
+        
+        # Cliente HTTP compartido para la API de plantillas (se abre dentro del bucle de eventos)
+        self.http: Optional[aiohttp.ClientSession] = None
+        
+        # Limitador por host: semáforo (cola FIFO de espera) + token bucket de peticiones por segundo
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._host_buckets: Dict[str, _TokenBucket] = {}
+        
+        # Escritura de workflows en segundo plano para no bloquear la navegación
+        self._write_queue = queue.Queue()
+        threading.Thread(target=self._writer, name="workflow-writer", daemon=True).start()
+        
+        # Categorías principales cacheadas de una ejecución anterior (si siguen frescas)
+        self.category_cache_path = self.download_dir / self.CATEGORY_CACHE_FILE
+        self.storage_state_path = self.download_dir / self.STORAGE_STATE_FILE
+        self._categories_cache = self._load_categories_cache()
+        # Cookies aceptadas: se cargan una vez y los contextos nuevos reciben el dict en
+        # memoria, sin leer un archivo que otro contexto podría estar reescribiendo
+        self._storage_state = self._load_storage_state()
+
+    def _load_categories_cache(self) -> Optional[List[Dict[str, str]]]:
+        """Carga las categorías cacheadas en disco si tienen menos de CATEGORY_CACHE_TTL"""
+        try:
+            if time.time() - self.category_cache_path.stat().st_mtime >= self.CATEGORY_CACHE_TTL:
+                return None
+            return json.loads(self.category_cache_path.read_text(encoding='utf-8')) or None
+        except (OSError, ValueError):
+            return None
+
+    def _save_categories_cache(self, categories: List[Dict[str, str]]) -> None:
+        """Guarda en disco las categorías descubiertas para próximas ejecuciones"""
+        try:
+            self.category_cache_path.write_text(json.dumps(categories, indent=2, ensure_ascii=False), encoding='utf-8')
+            self._categories_cache = categories
+        except OSError as e:
+            self.log(f"No se pudo guardar la caché de categorías: {e}", "WARNING")
+
+    def _load_storage_state(self) -> Optional[Dict[str, Any]]:
+        """Carga el estado (cookies) guardado por una ejecución anterior, si es válido"""
+        try:
+            return json.loads(self.storage_state_path.read_text(encoding='utf-8')) or None
+        except (OSError, ValueError):
+            return None
+
+    def _save_storage_state(self, state: Dict[str, Any]) -> None:
+        """Guarda el estado en memoria y en disco (archivo temporal + os.replace, atómico)"""
+        self._storage_state = state
+        tmp_path = self.storage_state_path.with_name(self.storage_state_path.name + ".tmp")
+        try:
+            tmp_path.write_text(json.dumps(state), encoding='utf-8')
+            os.replace(tmp_path, self.storage_state_path)
+        except OSError as e:
+            self.log(f"No se pudo guardar el estado de cookies: {e}", "WARNING")
+
+    def _writer(self) -> None:
+        """Hilo escritor: serializa y guarda en disco los workflows encolados por las pestañas.
+        
+        El resultado de cada escritura se devuelve al bucle de eventos a través del
+        futuro encolado junto al workflow.
+        """
+        while True:
+            file_path, workflow_data, written = self._write_queue.get()
+            ok = False
+            try:
+                file_path.write_bytes(self._serialize_workflow(workflow_data))
+                ok = True
+            except Exception as e:
+                # Cualquier fallo se queda en este workflow: el hilo debe seguir vivo
+                # para los siguientes y para que _write_queue.join() termine
+                self.log(f"❌ Error guardando {file_path.name}: {e}", "ERROR")
+            finally:
+                written.get_loop().call_soon_threadsafe(self._resolve_write, written, ok)
+                self._write_queue.task_done()
+
+    @staticmethod
+    def _resolve_write(written: "asyncio.Future[bool]", ok: bool) -> None:
+        """Completa en el bucle de eventos el futuro de una escritura (si nadie lo canceló)"""
+        if not written.done():
+            written.set_result(ok)
+
+    @staticmethod
+    def _serialize_workflow(workflow_data: Any) -> bytes:
+        """Serializa un workflow con orjson (C, mucho más rápido) y recurre a json cuando
+        orjson no puede (enteros de más de 64 bits, anidamiento de más de 254 niveles)"""
+        try:
+            return orjson.dumps(workflow_data, option=orjson.OPT_INDENT_2)
+        except orjson.JSONEncodeError:
+            return json.dumps(workflow_data, indent=2, ensure_ascii=False).encode('utf-8')
+
+    def _create_logger(self, name: str, level: str, fmt: str) -> logging.Logger:
+        """Crea un logger que encola sus registros para el QueueListener"""
+        handler = QueueHandler(self._log_queue)
+        handler.setFormatter(logging.Formatter(fmt, datefmt="%H:%M:%S"))
+        
+        logger = logging.getLogger(name)
+        logger.setLevel(level)
+        logger.propagate = False
+        logger.handlers = [handler]
+        return logger
 
     def log(self, message: str, level: str = "INFO") -> None:
         """Logging con timestamp y nivel"""
-        timestamp = time.strftime("%H:%M:%S")
-        print(f"[{timestamp}] [{level}] {message}")
+        self._logger.log(logging.getLevelName(level), message)
 
     def log_category(self, category: str, message: str, level: str = "INFO") -> None:
         """Logging específico por categoría"""
-        timestamp = time.strftime("%H:%M:%S") 
-        print(f"[{timestamp}] [{level}] [{category.upper()}] {message}")
+        levelno = logging.getLevelName(level)
+        if self._logger.isEnabledFor(levelno):
+            self._logger.log(levelno, f"[{category.upper()}] {message}")
 
-    def accept_all_cookies(self, page: Page) -> None:
+    def _close_logging(self) -> None:
+        """Vacía la cola de logs y libera los handlers de esta instancia"""
+        self._log_listener.stop()
+        for handler in self._log_listener.handlers:
+            handler.close()
+        # MemoryHandler.close() vuelca el búfer pero no cierra su destino: cerrar el fichero aquí
+        self._log_file_handler.close()
+        # Los loggers son globales por nombre: quitar los QueueHandler de esta instancia
+        self._logger.handlers = []
+        self._report_logger.handlers = []
+
+    @asynccontextmanager
+    async def _host_slot(self, url: str) -> AsyncIterator[None]:
+        """Reserva un hueco para pedir `url`: como mucho HOST_CONCURRENCY en vuelo por host
+        y como mucho requests_per_second peticiones por segundo (token bucket)"""
+        host = urlparse(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._host_semaphores[host] = asyncio.Semaphore(self.HOST_CONCURRENCY)
+            self._host_buckets[host] = _TokenBucket(self.requests_per_second)
+        
+        async with semaphore:
+            await self._host_buckets[host].acquire()
+            yield
+
+    async def _api_get(self, url: str, params: Optional[Dict[str, Any]] = None) -> Tuple[int, bytes]:
+        """GET a la API con el cliente HTTP compartido (sin pasar por Chromium); devuelve (estado, cuerpo).
+        
+        Lanza _RetryableStatusError ante 429 o 5xx para que _retry_transient lo reintente.
+        """
+        async with self._host_slot(url):
+            async with self.http.get(url, params=params) as response:
+                if response.status == 429 or response.status >= 500:
+                    raise _RetryableStatusError(response.status)
+                return response.status, await response.read()
+
+    async def _retry_transient(self, operation: Callable[[], Awaitable[Any]], category: str, description: str) -> Any:
+        """Ejecuta `operation` reintentando con backoff exponencial solo los TRANSIENT_ERRORS.
+        
+        Tras agotar MAX_BACKOFF_RETRIES relanza el último error transitorio.
+        """
+        for attempt in range(self.MAX_BACKOFF_RETRIES + 1):
+            try:
+                return await operation()
+            except self.TRANSIENT_ERRORS as e:
+                if attempt == self.MAX_BACKOFF_RETRIES:
+                    raise
+                delay = min(self.BACKOFF_BASE * 2 ** attempt, self.BACKOFF_MAX)
+                self.log_category(category, f"⏳ Error transitorio en {description} ({e or type(e).__name__}), reintentando en {delay:.0f}s", "WARNING")
+                await asyncio.sleep(delay)
+
+    async def accept_all_cookies(self, page: Page) -> None:
         """ACEPTAR todas las cookies para evitar bloqueos de contenido"""
         try:
+            if await page.evaluate("(marker) => document.cookie.toLowerCase().includes(marker)", self.CONSENT_COOKIE_MARKER):
+                self.log("🍪 Cookies ya aceptadas previamente")
+                return
+            
             self.log("🍪 Buscando y ACEPTANDO cookies para evitar bloqueos...")
             
-            page.wait_for_timeout(2000)
-            
-            accept_strategies = [
-                "text=Accept All",
-                "text=Accept all cookies", 
-                "text=Accept All Cookies",
-                "text=Accept",
-                "text=I Agree",
-                "text=Allow All",
-                "text=Accept & Close",
-                "button:has-text('Accept All')",
-                "button:has-text('Accept')",
-                "[data-testid='cookie-accept-all']",
-                ".cookie-accept-all",
-                "#cookie-accept-all",
-                "[onclick*='accept']",
-                ".cookiescript_accept_all",
-                "button[class*='accept']",
-                "div[class*='accept'][role='button']",
-            ]
-
-            for selector in accept_strategies:
-                try:
-                    element = page.query_selector(selector)
-                    if element and element.is_visible():
-                        element.click()
-                        page.wait_for_timeout(2000)
-                        self.log(f"✅ Cookies ACEPTADAS con: {selector}")
-                        return
-                except Exception:
-                    continue
-
-            self.log("⚠️ No se encontraron cookies para aceptar (tal vez ya aceptadas)")
+            # Un único locator con todos los selectores unidos por comas: una sola
+            # espera basada en eventos en lugar de un query_selector por estrategia.
+            # :visible antes de .first: una copia oculta del botón (móvil, plantilla)
+            # que aparezca antes en el DOM no debe tapar al botón visible
+            accept_button = page.locator(", ".join(f"{selector}:visible" for selector in self.COOKIE_ACCEPT_SELECTORS)).first
+            
+            try:
+                await accept_button.wait_for(state="visible", timeout=3000)
+            except PlaywrightTimeoutError:
+                self.log("⚠️ No se encontraron cookies para aceptar (tal vez ya aceptadas)")
+                return
+            
+            await accept_button.click()
+            self.log("✅ Cookies ACEPTADAS")
+            
+            # Guardar el estado para no repetir el proceso en próximas ejecuciones
+            self._save_storage_state(await page.context.storage_state())
 
         except Exception as e:
             self.log(f"Error manejando cookies: {e}", "ERROR")
 
-    def discover_main_categories(self, page: Page) -> List[Dict[str, str]]:
+    async def discover_main_categories(self, page: Optional[Page] = None) -> List[Dict[str, str]]:
         """Descubre todas las categorías principales desde la página inicial"""
         self.log("🗺️ DESCUBRIENDO categorías principales...")
         
+        if self.USE_HARDCODED_CATEGORIES:
+            categories = [dict(cat) for cat in _KNOWN_CATEGORIES]
+            self.log(f"📋 CATEGORÍAS PRINCIPALES (HARDCODEADAS, SIN AI): {len(categories)}")
+            return categories
+        
+        if self._categories_cache:
+            self.log(f"📋 CATEGORÍAS PRINCIPALES (CACHÉ): {len(self._categories_cache)}")
+            return [dict(cat) for cat in self._categories_cache]
+        
         try:
             # Múltiples intentos para navegar
             max_retries = 3
             for attempt in range(max_retries):
                 try:
                     self.log(f"🌐 Intento {attempt + 1}/{max_retries} - Navegando a: {self.CATEGORIES_PAGE}")
-                    page.goto(self.CATEGORIES_PAGE, wait_until="networkidle", timeout=self.TIMEOUT)
-                    page.wait_for_timeout(1500)  # Reducido de 2000 a 1500ms
+                    await page.goto(self.CATEGORIES_PAGE, wait_until="domcontentloaded", timeout=self.TIMEOUT)
                     break
                 except Exception as e:
                     if attempt == max_retries - 1:
                         self.log(f"❌ Error después de {max_retries} intentos: {e}", "ERROR")
                         # Si falla completamente, usar las categorías conocidas directamente
                         self.log("🔄 Usando categorías conocidas como fallback (EXCLUYENDO AI - ya procesada)")
-                        known_categories = [
-                            {'name': 'Sales', 'slug': 'sales', 'url': 'https://n8n.io/workflows/categories/sales/'},
-                            {'name': 'IT Ops', 'slug': 'it-ops', 'url': 'https://n8n.io/workflows/categories/it-ops/'},
-                            {'name': 'Marketing', 'slug': 'marketing', 'url': 'https://n8n.io/workflows/categories/marketing/'},
-                            {'name': 'Document Ops', 'slug': 'document-ops', 'url': 'https://n8n.io/workflows/categories/document-ops/'},
-                            {'name': 'Other', 'slug': 'other', 'url': 'https://n8n.io/workflows/categories/other/'},
-                            {'name': 'Support', 'slug': 'support', 'url': 'https://n8n.io/workflows/categories/support/'}
-                        ]
+                        known_categories = [dict(cat) for cat in _KNOWN_CATEGORIES]
                         self.log(f"📋 CATEGORÍAS PRINCIPALES (FALLBACK): {len(known_categories)}")
                         for cat in known_categories:
                             self.log(f"  • {cat['name']} → {cat['url']}")
                         return known_categories
                     else:
                         self.log(f"⚠️ Intento {attempt + 1} falló, reintentando en 5 segundos...", "WARNING")
-                        time.sleep(5)
+                        await asyncio.sleep(5)
             
-            self.accept_all_cookies(page)
+            await self.accept_all_cookies(page)
+            
+            # Esperar a que aparezcan los enlaces de categorías en lugar de una pausa fija
+            try:
+                await page.wait_for_selector("a[href*='/workflows/categories/']", state="attached", timeout=self.TIMEOUT)
+            except PlaywrightTimeoutError:
+                self.log("⚠️ No aparecieron enlaces de categorías a tiempo", "WARNING")
             
             categories = []
+            seen_urls = set()
             
             # Buscar los botones de categorías cerca de la barra de búsqueda
             category_selectors = [
@@ -195,11 +593,11 @@ class N8NComprehensiveWorkflowScraper:
             
             # Estrategia: Buscar enlaces que contengan '/workflows/categories/'
             for selector in category_selectors:
-                elements = page.query_selector_all(selector)
+                elements = await page.query_selector_all(selector)
                 for element in elements:
                     try:
-                        href = element.get_attribute('href')
-                        text = element.inner_text().strip()
+                        href = await element.get_attribute('href')
+                        text = (await element.inner_text()).strip()
                         
                         if href and '/workflows/categories/' in href and text:
                             # Construir URL completa
@@ -215,7 +613,8 @@ class N8NComprehensiveWorkflowScraper:
                             }
                             
                             # Evitar duplicados
-                            if category_info not in categories:
+                            if full_url not in seen_urls:
+                                seen_urls.add(full_url)
                                 categories.append(category_info)
                                 
                     except Exception as e:
@@ -230,15 +629,9 @@ class N8NComprehensiveWorkflowScraper:
             # Si no encontramos por selectores, usar las conocidas (SIN AI)
             if not categories:
                 self.log("⚠️ No se encontraron categorías automáticamente, usando lista conocida (SIN AI)")
-                known_categories = [
-                    {'name': 'Sales', 'slug': 'sales', 'url': 'https://n8n.io/workflows/categories/sales/'},
-                    {'name': 'IT Ops', 'slug': 'it-ops', 'url': 'https://n8n.io/workflows/categories/it-ops/'},
-                    {'name': 'Marketing', 'slug': 'marketing', 'url': 'https://n8n.io/workflows/categories/marketing/'},
-                    {'name': 'Document Ops', 'slug': 'document-ops', 'url': 'https://n8n.io/workflows/categories/document-ops/'},
-                    {'name': 'Other', 'slug': 'other', 'url': 'https://n8n.io/workflows/categories/other/'},
-                    {'name': 'Support', 'slug': 'support', 'url': 'https://n8n.io/workflows/categories/support/'}
-                ]
-                categories = known_categories
+                categories = [dict(cat) for cat in _KNOWN_CATEGORIES]
+            else:
+                self._save_categories_cache(categories)
             
             self.log(f"📋 CATEGORÍAS PRINCIPALES ENCONTRADAS: {len(categories)}")
             for cat in categories:
@@ -250,239 +643,138 @@ class N8NComprehensiveWorkflowScraper:
             self.log(f"Error descubriendo categorías principales: {e}", "ERROR")
             return []
 
-    def discover_subcategories(self, page: Page, category: Dict[str, str]) -> List[Dict[str, str]]:
+    def discover_subcategories(self, category: Dict[str, str]) -> List[Dict[str, str]]:
         """Descubre subcategorías usando datos hardcodeados obtenidos de investigación MCP"""
         self.log_category(category['name'], f"🔍 Obteniendo subcategorías hardcodeadas...")
         
-        # SUBCATEGORÍAS HARDCODEADAS basadas en investigación exhaustiva con MCP Playwright
-        # Datos obtenidos de análisis JavaScript DOM en cada categoría principal
-        
-        known_subcategories = {
-            'sales': [
-                {'name': 'CRM', 'slug': 'crm', 'url': 'https://n8n.io/workflows/categories/crm/'},
-                {'name': 'Lead Generation', 'slug': 'lead-generation', 'url': 'https://n8n.io/workflows/categories/lead-generation/'},
-                {'name': 'Lead Nurturing', 'slug': 'lead-nurturing', 'url': 'https://n8n.io/workflows/categories/lead-nurturing/'}
-            ],
-            'marketing': [
-                {'name': 'Content Creation', 'slug': 'content-creation', 'url': 'https://n8n.io/workflows/categories/content-creation/'},
-                {'name': 'Market Research', 'slug': 'market-research', 'url': 'https://n8n.io/workflows/categories/market-research/'},
-                {'name': 'Social Media', 'slug': 'social-media', 'url': 'https://n8n.io/workflows/categories/social-media/'}
-            ],
-            'it-ops': [
-                {'name': 'SecOps', 'slug': 'secops', 'url': 'https://n8n.io/workflows/categories/secops/'},
-                {'name': 'Engineering', 'slug': 'engineering', 'url': 'https://n8n.io/workflows/categories/engineering/'},
-                {'name': 'DevOps', 'slug': 'devops', 'url': 'https://n8n.io/workflows/categories/devops/'}
-            ],
-            'document-ops': [
-                {'name': 'Document Extraction', 'slug': 'document-extraction', 'url': 'https://n8n.io/workflows/categories/document-extraction/'},
-                {'name': 'File Management', 'slug': 'file-management', 'url': 'https://n8n.io/workflows/categories/file-management/'},
-                {'name': 'Invoice Processing', 'slug': 'invoice-processing', 'url': 'https://n8n.io/workflows/categories/invoice-processing/'}
-            ],
-            'support': [
-                {'name': 'Support Chatbot', 'slug': 'support-chatbot', 'url': 'https://n8n.io/workflows/categories/support-chatbot/'},
-                {'name': 'Ticket Management', 'slug': 'ticket-management', 'url': 'https://n8n.io/workflows/categories/ticket-management/'},
-                {'name': 'Internal Wiki', 'slug': 'internal-wiki', 'url': 'https://n8n.io/workflows/categories/internal-wiki/'}
-            ],
-            'other': [
-                {'name': 'Crypto Trading', 'slug': 'crypto-trading', 'url': 'https://n8n.io/workflows/categories/crypto-trading/'},
-                {'name': 'HR', 'slug': 'hr', 'url': 'https://n8n.io/workflows/categories/hr/'},
-                {'name': 'Miscellaneous', 'slug': 'miscellaneous', 'url': 'https://n8n.io/workflows/categories/miscellaneous/'},
-                {'name': 'Personal Productivity', 'slug': 'personal-productivity', 'url': 'https://n8n.io/workflows/categories/personal-productivity/'},
-                {'name': 'Project Management', 'slug': 'project-management', 'url': 'https://n8n.io/workflows/categories/project-management/'}
-            ]
-        }
-        
-        category_slug = category['slug'].lower()
+        entries = _KNOWN_SUBCATEGORIES.get(category['slug'].lower(), ())
+        subcategories = [{**entry, 'parent': category['slug']} for entry in entries]
         
-        if category_slug in known_subcategories:
-            subcategories = []
-            for subcat_data in known_subcategories[category_slug]:
-                subcategory_info = {
-                    'name': subcat_data['name'],
-                    'slug': subcat_data['slug'],
-                    'url': subcat_data['url'],
-                    'parent': category['slug']
-                }
-                subcategories.append(subcategory_info)
-            
-            self.log_category(category['name'], f"📋 Subcategorías hardcodeadas: {len(subcategories)}")
-            for subcat in subcategories:
-                self.log_category(category['name'], f"  • {subcat['name']} → {subcat['url']}")
-            
-            return subcategories
-        else:
+        if not subcategories:
             self.log_category(category['name'], "ℹ️ No tiene subcategorías conocidas, se procesará directamente")
             return []
+        
+        self.log_category(category['name'], f"📋 Subcategorías hardcodeadas: {len(subcategories)}")
+        for subcat in subcategories:
+            self.log_category(category['name'], f"  • {subcat['name']} → {subcat['url']}")
+        
+        return subcategories
 
-    def extract_workflow_links(self, page: Page, category_name: str = "Unknown") -> List[Dict[str, Any]]:
+    async def extract_workflow_links(self, page: Page, category_name: str = "Unknown") -> List[Dict[str, Any]]:
         """Extrae links de workflows de la página actual"""
         workflows = []
+        seen_slugs = set()
         
         try:
-            # Esperar a que se carguen los workflows (reducido)
-            page.wait_for_timeout(1500)  # Reducido de 2000 a 1500ms
-            
-            # Buscar enlaces de workflows
-            workflow_selectors = [
-                "a[href*='/workflows/']",
-                "link[href*='/workflows/']",
-                "[data-workflow-id]"
-            ]
+            # El llamador ya esperó a que hubiera tarjetas renderizadas.
+            # Una sola llamada al navegador: el DOM se recorre en la página y
+            # se devuelve un array JSON con los datos de cada tarjeta
+            cards = await page.evaluate(_EXTRACT_CARDS_JS)
             
-            for selector in workflow_selectors:
-                elements = page.query_selector_all(selector)
-                
-                for element in elements:
-                    try:
-                        href = element.get_attribute('href')
+            # Evitar formatear los mensajes DEBUG cuando ese nivel está desactivado
+            debug = self._logger.isEnabledFor(logging.DEBUG)
+            
+            for card in cards:
+                try:
+                    # Los enlaces ya vienen filtrados desde el navegador (solo workflows individuales)
+                    href = card['href']
+                    
+                    # Extraer información del workflow
+                    title = card['title'] or "Unknown Title"
+                    element_text = card['text'] or ""
+                    
+                    # Generar slug del workflow
+                    slug_match = _SLUG_RE.search(href)
+                    slug = slug_match.group(1) if slug_match else f"workflow-{len(workflows)}"
+                    workflow_id = slug.split('-', 1)[0] if slug_match else slug
+                    
+                    full_url = urljoin(self.BASE_URL, href)
+                    
+                    # NUEVO SISTEMA DE CONTEO MEJORADO (V3.1) - INVESTIGACIÓN CON MCP PLAYWRIGHT
+                    # Basado en investigación DOM de n8n.io: nodos visibles + indicador +X = total nodos
+                    nodes_count = 0
+                    visible_nodes = card['visible']
+                    plus_indicator = card['plus']
+                    
+                    # MÉTODO 1: Nodos visibles (li con tooltip) + indicador +X de la lista ul
+                    if card['hasNodeList']:
+                        # CÁLCULO CORRECTO: visible + plus_indicator
+                        nodes_count = visible_nodes + plus_indicator
                         
-                        # Verificar que es un workflow individual (no una categoría)
-                        if (href and '/workflows/' in href and 
-                            '/workflows/categories/' not in href and
-                            re.search(r'/workflows/\d+', href)):
-                            
-                            # Extraer información del workflow
-                            title_element = element.query_selector('h3, .workflow-title, [class*="title"]')
-                            title = title_element.inner_text().strip() if title_element else "Unknown Title"
-                            
-                            # Generar slug del workflow
-                            slug_match = re.search(r'/workflows/(\d+-[^/]+)', href)
-                            slug = slug_match.group(1) if slug_match else f"workflow-{len(workflows)}"
-                            
-                            full_url = urljoin(self.BASE_URL, href)
-                            
-                            # NUEVO SISTEMA DE CONTEO MEJORADO (V3.1) - INVESTIGACIÓN CON MCP PLAYWRIGHT
-                            # Basado en investigación DOM de n8n.io: nodos visibles + indicador +X = total nodos
-                            nodes_count = 0
-                            visible_nodes = 0
-                            plus_indicator = 0
-                            
-                            # MÉTODO 1: Buscar el contenedor de nodos (lista ul)
-                            node_list = element.query_selector('ul')
-                            if node_list:
-                                # Contar nodos visibles (li con tooltip)
-                                visible_node_elements = node_list.query_selector_all('li:has([role="tooltip"])')
-                                visible_nodes = len(visible_node_elements)
-                                
-                                # Buscar indicador +X (li con span que no tiene role)
-                                plus_elements = node_list.query_selector_all('li span:not([role])')
-                                for plus_element in plus_elements:
-                                    plus_text = plus_element.inner_text().strip()
-                                    plus_match = re.search(r'\+(\d+)', plus_text)
-                                    if plus_match:
-                                        plus_indicator = int(plus_match.group(1))
-                                        break
-                                
-                                # CÁLCULO CORRECTO: visible + plus_indicator
-                                nodes_count = visible_nodes + plus_indicator
-                                
-                                if nodes_count > 0:
-                                    self.log_category(category_name, f"  📊 CONTEO MEJORADO para '{title[:30]}': {visible_nodes} visibles + {plus_indicator} adicionales = {nodes_count} total", "DEBUG")
-                            
-                            # MÉTODO 2: Fallback - buscar solo indicador +X (método anterior)
-                            if nodes_count == 0:
-                                element_text = element.inner_text()
-                                plus_matches = re.findall(r'\+(\d+)', element_text)
-                                if plus_matches:
-                                    try:
-                                        plus_indicator = int(plus_matches[0])
-                                        # Sin nodos visibles detectados, usar solo el indicador
-                                        # (esto puede subestimar el total real)
-                                        nodes_count = plus_indicator
-                                        self.log_category(category_name, f"  📊 FALLBACK - Solo +{plus_indicator} detectado para '{title[:30]}' (puede ser subestimación)", "DEBUG")
-                                    except:
-                                        pass
-                            
-                            # MÉTODO 3: Fallback adicional - buscar otros patrones comunes
-                            if nodes_count == 0:
-                                node_text_patterns = [
-                                    r'(\d+)\s*nodes?',  # "5 nodes" o "5 node"
-                                    r'(\d+)\s*nodos?',  # "5 nodos" o "5 nodo"
-                                ]
-                                
-                                element_text = element.inner_text().lower()
-                                for pattern in node_text_patterns:
-                                    match = re.search(pattern, element_text, re.IGNORECASE)
-                                    if match:
-                                        try:
-                                            nodes_count = int(match.group(1))
-                                            self.log_category(category_name, f"  📊 Nodos detectados via patrón texto: {nodes_count} para '{title[:30]}'", "DEBUG")
-                                            break
-                                        except:
-                                            continue
-                            
-                            # Si aún no tenemos conteo, registrar para debugging
-                            if nodes_count == 0:
-                                self.log_category(category_name, f"  ⚠️ No se pudo detectar nodos para '{title[:30]}' - OMITIENDO (puede necesitar revisión manual)", "DEBUG")
-                            
-                            # FILTRO DE PRECIO: Verificar que no tenga precio (debe ser gratuito)
-                            has_price = False
-                            is_free = False
-                            
-                            # Buscar indicadores de precio ($X, €X, etc.)
-                            price_selectors = [
-                                'font[dir="auto"][style*="vertical-align: inherit;"]',  # Selector específico para precios
-                                'font:has-text("$")',
-                                'span:has-text("$")',
-                                'div:has-text("$")'
-                            ]
-                            
-                            for price_selector in price_selectors:
-                                price_element = element.query_selector(price_selector)
-                                if price_element:
-                                    price_text = price_element.inner_text().strip()
-                                    if '$' in price_text or '€' in price_text or '£' in price_text:
-                                        has_price = True
-                                        self.log_category(category_name, f"  💰 PRECIO DETECTADO: {price_text} para '{title[:30]}' - RECHAZANDO", "DEBUG")
-                                        break
-                            
-                            # Buscar indicador de gratuidad
-                            free_selectors = [
-                                'span:has-text("Free")',
-                                'div:has-text("Free")',
-                                'span:has-text("free")',
-                                'div:has-text("free")'
-                            ]
-                            
-                            for free_selector in free_selectors:
-                                free_element = element.query_selector(free_selector)
-                                if free_element:
-                                    free_text = free_element.inner_text().strip().lower()
-                                    if 'free' in free_text:
-                                        is_free = True
-                                        self.log_category(category_name, f"  🆓 GRATUITO CONFIRMADO para '{title[:30]}'", "DEBUG")
-                                        break
-                            
-                            workflow_data = {
-                                'title': title,
-                                'slug': slug,
-                                'url': full_url,
-                                'nodes': nodes_count,
-                                'category': category_name,
-                                'has_price': has_price,
-                                'is_free': is_free
-                            }
-                            
-                            # FILTROS COMBINADOS: nodos >= MIN_NODES AND sin precio AND debe ser gratuito
-                            if (nodes_count > 0 and 
-                                nodes_count >= self.MIN_NODES and 
-                                not has_price and 
-                                is_free and 
-                                workflow_data not in workflows):
-                                workflows.append(workflow_data)
-                                self.log_category(category_name, f"  ✅ ACEPTADO: {title[:40]}... ({nodes_count} nodos, GRATUITO)", "DEBUG")
-                            else:
-                                if nodes_count == 0:
-                                    self.log_category(category_name, f"  ❌ OMITIDO - Sin info de nodos: {title[:40]}...", "DEBUG")
-                                elif nodes_count < self.MIN_NODES:
-                                    self.log_category(category_name, f"  ❌ RECHAZADO - Pocos nodos: {title[:40]}... ({nodes_count} nodos)", "DEBUG")
-                                elif has_price:
-                                    self.log_category(category_name, f"  ❌ RECHAZADO - Tiene precio: {title[:40]}...", "DEBUG")
-                                elif not is_free:
-                                    self.log_category(category_name, f"  ❌ RECHAZADO - No es gratuito: {title[:40]}...", "DEBUG")
-                                
-                    except Exception as e:
-                        self.log(f"Error procesando workflow: {e}", "DEBUG")
+                        if debug and nodes_count > 0:
+                            self.log_category(category_name, f"  📊 CONTEO MEJORADO para '{title[:30]}': {visible_nodes} visibles + {plus_indicator} adicionales = {nodes_count} total", "DEBUG")
+                    
+                    # MÉTODO 2: Fallback - buscar solo indicador +X (método anterior)
+                    if nodes_count == 0:
+                        plus_match = _PLUS_RE.search(element_text)
+                        if plus_match:
+                            plus_indicator = int(plus_match.group(1))
+                            # Sin nodos visibles detectados, usar solo el indicador
+                            # (esto puede subestimar el total real)
+                            nodes_count = plus_indicator
+                            if debug:
+                                self.log_category(category_name, f"  📊 FALLBACK - Solo +{plus_indicator} detectado para '{title[:30]}' (puede ser subestimación)", "DEBUG")
+                    
+                    # MÉTODO 3: Fallback adicional - buscar otros patrones comunes
+                    if nodes_count == 0:
+                        for pattern in _NODES_RES:
+                            match = pattern.search(element_text)
+                            if match:
+                                try:
+                                    nodes_count = int(match.group(1))
+                                    if debug:
+                                        self.log_category(category_name, f"  📊 Nodos detectados via patrón texto: {nodes_count} para '{title[:30]}'", "DEBUG")
+                                    break
+                                except:
+                                    continue
+                    
+                    # Si aún no tenemos conteo, registrar para debugging
+                    if debug and nodes_count == 0:
+                        self.log_category(category_name, f"  ⚠️ No se pudo detectar nodos para '{title[:30]}' - OMITIENDO (puede necesitar revisión manual)", "DEBUG")
+                    
+                    # FILTRO DE PRECIO: Verificar que no tenga precio (debe ser gratuito)
+                    # Ambos indicadores se calculan en el navegador sobre el texto de la tarjeta
+                    has_price = card['hasPrice']
+                    is_free = card['isFree']
+                    
+                    if debug and has_price:
+                        self.log_category(category_name, f"  💰 PRECIO DETECTADO para '{title[:30]}' - RECHAZANDO", "DEBUG")
+                    if debug and is_free:
+                        self.log_category(category_name, f"  🆓 GRATUITO CONFIRMADO para '{title[:30]}'", "DEBUG")
+                    
+                    workflow_data = {
+                        'title': title,
+                        'id': workflow_id,
+                        'slug': slug,
+                        'url': full_url,
+                        'nodes': nodes_count,
+                        'category': category_name,
+                        'has_price': has_price,
+                        'is_free': is_free
+                    }
+                    
+                    # FILTROS COMBINADOS: nodos >= MIN_NODES AND sin precio AND debe ser gratuito
+                    if (nodes_count > 0 and 
+                        nodes_count >= self.MIN_NODES and 
+                        not has_price and 
+                        is_free and 
+                        slug not in seen_slugs):
+                        seen_slugs.add(slug)
+                        workflows.append(workflow_data)
+                        if debug:
+                            self.log_category(category_name, f"  ✅ ACEPTADO: {title[:40]}... ({nodes_count} nodos, GRATUITO)", "DEBUG")
+                    elif debug:
+                        if nodes_count == 0:
+                            self.log_category(category_name, f"  ❌ OMITIDO - Sin info de nodos: {title[:40]}...", "DEBUG")
+                        elif nodes_count < self.MIN_NODES:
+                            self.log_category(category_name, f"  ❌ RECHAZADO - Pocos nodos: {title[:40]}... ({nodes_count} nodos)", "DEBUG")
+                        elif has_price:
+                            self.log_category(category_name, f"  ❌ RECHAZADO - Tiene precio: {title[:40]}...", "DEBUG")
+                        elif not is_free:
+                            self.log_category(category_name, f"  ❌ RECHAZADO - No es gratuito: {title[:40]}...", "DEBUG")
+                        
+                except Exception as e:
+                    self.log(f"Error procesando workflow: {e}", "DEBUG")
             
             self.log_category(category_name, f"Workflows válidos encontrados: {len(workflows)}")
             
@@ -491,199 +783,369 @@ class N8NComprehensiveWorkflowScraper:
         
         return workflows
 
-    def load_more_pages(self, page: Page, category_name: str = "Unknown") -> bool:
-        """Carga más páginas si está disponible el botón 'Load more templates'"""
+    async def fetch_subcategory_page(self, page: Page, category: Dict[str, str], page_number: int,
+                                     card_locator: Locator, accept_cookies: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """Navega directamente a la página N de una subcategoría y extrae sus workflows.
+        
+        `card_locator` es el locator de la primera tarjeta, creado una vez por pestaña y
+        reutilizado en todas las páginas. `accept_cookies` se activa en la primera página
+        cargada por DOM, que no tiene por qué ser la 1 si la API falla a mitad del listado.
+        Devuelve None cuando la página ya no tiene tarjetas (fin de la paginación); los
+        errores de navegación que persisten tras los reintentos se propagan al llamador.
+        """
+        category_name = category['name']
+        page_url = f"{category['url']}?count={self.WORKFLOWS_PER_PAGE}&page={page_number}"
+        self.log_category(category_name, f"🌐 Navegando a: {page_url}")
+        
+        async def goto_page() -> None:
+            async with self._host_slot(page_url):
+                await page.goto(page_url, wait_until="domcontentloaded", timeout=self.TIMEOUT)
+        
+        await self._retry_transient(goto_page, category_name, f"página {page_number}")
+        
+        if accept_cookies:
+            # Cada pestaña de trabajo tiene su propio contexto: aceptar cookies aquí
+            await self.accept_all_cookies(page)
+        
+        # La página ya está cargada: si la tarjeta no aparece en READY_TIMEOUT es que no hay más
         try:
-            load_more_button = page.query_selector("text=Load more templates")
-            
-            if load_more_button and load_more_button.is_visible():
-                self.log_category(category_name, "📄 Cargando más templates...")
-                load_more_button.click()
-                page.wait_for_timeout(2000)  # Reducido de 3000 a 2000ms
-                return True
+            await card_locator.wait_for(state="attached", timeout=self.READY_TIMEOUT)
+        except PlaywrightTimeoutError:
+            return None
+        
+        return await self.extract_workflow_links(page, category_name)
+
+    async def discover_workflows_via_api(self, category: Dict[str, str], page_number: int) -> Optional[List[Dict[str, Any]]]:
+        """Obtiene la página N del listado de una subcategoría desde la API de búsqueda de plantillas.
+        
+        Devuelve los mismos diccionarios que extract_workflow_links (ya filtrados) y None
+        cuando el listado se acaba. Lanza una excepción si la API no responde bien, para
+        que el llamador vuelva al listado por DOM.
+        """
+        category_name = category['name']
+        params = {'category': category_name, 'page': page_number, 'rows': self.WORKFLOWS_PER_PAGE}
+        
+        status, body = await self._retry_transient(
+            lambda: self._api_get(self.TEMPLATES_SEARCH_API_URL, params), category_name, f"listado página {page_number}")
+        if not 200 <= status < 300:
+            raise RuntimeError(f"la API de búsqueda respondió {status}")
+        
+        results = orjson.loads(body).get('workflows') or []
+        if not results:
+            return None
+        
+        workflows = []
+        for result in results:
+            title = result.get('name') or "Unknown Title"
+            workflow_id = str(result['id'])
+            # El slug del sitio (sin puntuación y truncado) no se puede reconstruir desde el
+            # título: se usa el que devuelva la API y, si no hay, solo el id. La caché y la
+            # deduplicación van por id, así que coinciden con los archivos del listado por DOM
+            api_slug = result.get('slug')
+            if api_slug:
+                slug = api_slug if api_slug.startswith(f"{workflow_id}-") else f"{workflow_id}-{api_slug}"
             else:
-                self.log_category(category_name, "No hay más páginas para cargar")
-                return False
-                
-        except Exception as e:
-            self.log_category(category_name, f"Error cargando más páginas: {e}", "ERROR")
-            return False
+                slug = workflow_id
+            nodes_count = len(result.get('nodes') or [])
+            has_price = bool(result.get('price') or result.get('purchaseUrl'))
+            
+            # Mismos filtros que el listado por DOM: nodos >= MIN_NODES y gratuito
+            if nodes_count >= self.MIN_NODES and not has_price:
+                workflows.append({
+                    'title': title,
+                    'id': workflow_id,
+                    'slug': slug,
+                    'url': f"{self.BASE_URL}{slug}/",
+                    'nodes': nodes_count,
+                    'category': category_name,
+                    'has_price': has_price,
+                    'is_free': not has_price
+                })
+        
+        self.log_category(category_name, f"Workflows válidos encontrados (API): {len(workflows)}")
+        return workflows
 
-    def download_workflow_via_clipboard(self, page: Page, workflow: Dict[str, Any]) -> bool:
-        """Descarga workflow usando el método de portapapeles"""
+    async def download_workflow(self, workflow: Dict[str, Any]) -> bool:
+        """Descarga un workflow por la API de plantillas (o por portapapeles si la API falla)"""
         category_dir = self.download_dir / workflow['category']
         category_dir.mkdir(exist_ok=True)
         
         file_path = category_dir / f"{workflow['slug']}.json"
         
-        if file_path.exists():
+        cache_key = (workflow['category'], workflow['id'])
+        if cache_key in self.downloaded_workflows:
+            self.global_stats['cache_hits'] += 1
             self.log_category(workflow['category'], f"Ya existe: {workflow['slug']} - omitiendo")
             return True
         
         try:
-            self.log_category(workflow['category'], f"🌐 Navegando a: {workflow['url']}")
-            page.goto(workflow['url'], wait_until="networkidle", timeout=self.TIMEOUT)
-            page.wait_for_timeout(2000)  # Reducido de 3000 a 2000ms
-            
-            if "n8n.io" not in page.url:
-                self.log_category(workflow['category'], f"❌ La página no se cargó correctamente: {page.url}")
+            workflow_data = await self._fetch_workflow_json_via_api(workflow)
+            if workflow_data is None:
+                workflow_data = await self._retry_transient(
+                    lambda: self._fetch_workflow_json_via_pooled_tab(workflow), workflow['category'], workflow['slug'])
+            if workflow_data is None:
                 return False
             
-            # Buscar y hacer clic en "Use for free"
-            use_button = page.query_selector("button:has-text('Use for free')")
-            if use_button and use_button.is_visible():
-                use_button.click()
-                page.wait_for_timeout(2500)  # Reducido de 4000 a 2500ms
-                
-                copy_selectors = [
-                    'div.cursor-pointer:has-text("Copy template to clipboard (JSON)")',
-                    'div:has-text("Copy template to clipboard (JSON)")',
-                    'button:has-text("Copy template to clipboard")',
-                    '[data-testid="copy-template"]'
-                ]
-                
-                copy_clicked = False
-                for selector in copy_selectors:
-                    copy_button = page.query_selector(selector)
-                    if copy_button and copy_button.is_visible():
-                        copy_button.click()
-                        page.wait_for_timeout(800)  # Reducido de 1000 a 800ms
-                        copy_clicked = True
-                        break
-                
-                if copy_clicked:
-                    clipboard_content = page.evaluate("""
-                        () => {
-                            return navigator.clipboard.readText().then(text => {
-                                return text;
-                            }).catch(error => {
-                                return null;
-                            });
-                        }
-                    """)
-                    
-                    if clipboard_content:
-                        try:
-                            workflow_data = json.loads(clipboard_content)
-                            
-                            with open(file_path, 'w', encoding='utf-8') as f:
-                                json.dump(workflow_data, f, indent=2, ensure_ascii=False)
-                            
-                            return True
-                            
-                        except json.JSONDecodeError:
-                            self.log_category(workflow['category'], f"❌ JSON inválido para {workflow['slug']}")
-                            return False
-                    else:
-                        self.log_category(workflow['category'], f"❌ No se pudo leer portapapeles para {workflow['slug']}")
-                        return False
-                else:
-                    self.log_category(workflow['category'], f"❌ No se encontró botón de copia para {workflow['slug']}")
-                    return False
-            else:
-                self.log_category(workflow['category'], f"❌ No se encontró botón 'Use for free' para {workflow['slug']}")
+            # La escritura la hace el hilo escritor en segundo plano; solo cuenta como
+            # descargado (y entra en la caché) cuando el archivo se ha guardado de verdad
+            written = asyncio.get_running_loop().create_future()
+            self._write_queue.put((file_path, workflow_data, written))
+            if not await written:
                 return False
-                
+            self.downloaded_workflows.add(cache_key)
+            return True
+        
+        except self.TRANSIENT_ERRORS as e:
+            # Solo cuenta como error cuando se han agotado los reintentos
+            self.log_category(workflow['category'], f"❌ Error transitorio persistente descargando {workflow['slug']} tras {self.MAX_BACKOFF_RETRIES + 1} intentos: {e}")
+            return False
         except Exception as e:
             self.log_category(workflow['category'], f"❌ Error descargando {workflow['slug']}: {e}")
             return False
 
-    def download_batch_immediately(self, context: BrowserContext, workflows: List[Dict[str, Any]], category_name: str) -> None:
-        """Descarga inmediata de un lote de workflows"""
+    async def _fetch_workflow_json_via_api(self, workflow: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Obtiene el JSON del workflow con una única petición HTTP a la API de plantillas"""
+        # Sin renderizado, clics ni permisos de portapapeles: la petición reutiliza
+        # las conexiones keep-alive del cliente HTTP compartido
+        api_url = self.TEMPLATES_API_URL.format(id=workflow['id'])
+        
+        # 429, 5xx, timeouts y errores de red se reintentan con backoff exponencial
+        try:
+            status, body = await self._retry_transient(lambda: self._api_get(api_url), workflow['category'], workflow['slug'])
+        except self.TRANSIENT_ERRORS as e:
+            self.log_category(workflow['category'], f"⚠️ API no disponible para {workflow['slug']} ({e or type(e).__name__}), usando portapapeles", "WARNING")
+            return None
+        
+        if not 200 <= status < 300:
+            self.log_category(workflow['category'], f"⚠️ API respondió {status} para {workflow['slug']}, usando portapapeles", "DEBUG")
+            return None
+        
+        # Un JSON inválido no se arregla reintentando: se registra y se prueba el portapapeles
+        try:
+            # json y no orjson: orjson convierte en float los enteros de más de 64 bits
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            self.log_category(workflow['category'], f"❌ JSON inválido de la API para {workflow['slug']}", "ERROR")
+            return None
+        # El JSON importable (el mismo que copia el portapapeles) va anidado en workflow.workflow;
+        # el envoltorio de la API son metadatos, no un workflow: si falta, se usa el portapapeles
+        wrapper = payload.get('workflow') if isinstance(payload, dict) else None
+        workflow_json = wrapper.get('workflow') if isinstance(wrapper, dict) else None
+        if not isinstance(workflow_json, dict) or not workflow_json:
+            self.log_category(workflow['category'], f"⚠️ Respuesta de la API sin workflow importable para {workflow['slug']}, usando portapapeles", "WARNING")
+            return None
+        return workflow_json
+
+    async def _fetch_workflow_json_via_pooled_tab(self, workflow: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Fallback por portapapeles con una pestaña prestada del pool solo durante el intento"""
+        # La pestaña se devuelve antes de cada espera de backoff: las descargas por API
+        # y los reintentos en espera no ocupan pestañas
+        tab = await self.tab_pool.get()
+        try:
+            await self._ensure_pool_cookies(tab)
+            return await self._fetch_workflow_json_via_clipboard(tab, workflow)
+        finally:
+            self.tab_pool.put_nowait(tab)
+
+    def _has_consent_cookie(self, cookies: List[Dict[str, Any]]) -> bool:
+        """Indica si entre `cookies` está la del banner de consentimiento"""
+        return any(self.CONSENT_COOKIE_MARKER in f"{c.get('name', '')}={c.get('value', '')}".lower() for c in cookies)
+
+    async def _ensure_pool_cookies(self, tab: Page) -> None:
+        """Acepta las cookies una sola vez en el contexto compartido por las pestañas del pool"""
+        if self._pool_cookies_ready:
+            return
+        async with self._pool_cookies_lock:
+            if self._pool_cookies_ready:
+                return
+            try:
+                # Sin navegar si el consentimiento ya está en el contexto o en el estado guardado
+                if not self._has_consent_cookie(await tab.context.cookies()):
+                    saved_cookies = (self._storage_state or {}).get('cookies') or []
+                    if self._has_consent_cookie(saved_cookies):
+                        await tab.context.add_cookies(saved_cookies)
+                    else:
+                        async with self._host_slot(self.BASE_URL):
+                            await tab.goto(self.BASE_URL, wait_until="domcontentloaded", timeout=self.TIMEOUT)
+                        await self.accept_all_cookies(tab)
+            except Exception as e:
+                self.log(f"⚠️ No se pudieron aceptar cookies en las pestañas de descarga: {e}", "WARNING")
+            # Un solo intento por ejecución: no repetir la carga de la portada en cada préstamo
+            self._pool_cookies_ready = True
+
+    async def _fetch_workflow_json_via_clipboard(self, page: Page, workflow: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Fallback: abre la página del workflow y copia su JSON desde el portapapeles"""
+        self.log_category(workflow['category'], f"🌐 Navegando a: {workflow['url']}")
+        # domcontentloaded + espera al botón: networkidle no llega nunca (o llega
+        # antes de tiempo) en páginas con analítica
+        async with self._host_slot(workflow['url']):
+            await page.goto(workflow['url'], wait_until="domcontentloaded", timeout=self.TIMEOUT)
+        
+        if "n8n.io" not in page.url:
+            self.log_category(workflow['category'], f"❌ La página no se cargó correctamente: {page.url}")
+            return None
+        
+        # Buscar y hacer clic en "Use for free" (esperando a que aparezca)
+        use_button = page.locator("button:has-text('Use for free')").first
+        try:
+            await use_button.wait_for(state="visible", timeout=self.READY_TIMEOUT)
+        except PlaywrightTimeoutError:
+            self.log_category(workflow['category'], f"❌ No se encontró botón 'Use for free' para {workflow['slug']}")
+            return None
+        
+        await use_button.click()
+        
+        # Esperar al menú de copia en lugar de una pausa fija
+        try:
+            await page.wait_for_selector('div:has-text("Copy template to clipboard")', timeout=5000)
+        except PlaywrightTimeoutError:
+            pass
+        
+        copy_selectors = [
+            'div.cursor-pointer:has-text("Copy template to clipboard (JSON)")',
+            'div:has-text("Copy template to clipboard (JSON)")',
+            'button:has-text("Copy template to clipboard")',
+            '[data-testid="copy-template"]'
+        ]
+        
+        copy_clicked = False
+        for selector in copy_selectors:
+            copy_button = await page.query_selector(selector)
+            if copy_button and await copy_button.is_visible():
+                await copy_button.click()
+                await page.wait_for_timeout(800)  # Reducido de 1000 a 800ms
+                copy_clicked = True
+                break
+        
+        if not copy_clicked:
+            self.log_category(workflow['category'], f"❌ No se encontró botón de copia para {workflow['slug']}")
+            return None
+        
+        clipboard_content = await page.evaluate("""
+            () => {
+                return navigator.clipboard.readText().then(text => {
+                    return text;
+                }).catch(error => {
+                    return null;
+                });
+            }
+        """)
+        
+        if not clipboard_content:
+            self.log_category(workflow['category'], f"❌ No se pudo leer portapapeles para {workflow['slug']}")
+            return None
+        
+        try:
+            return json.loads(clipboard_content)
+        except json.JSONDecodeError:
+            self.log_category(workflow['category'], f"❌ JSON inválido para {workflow['slug']}")
+            return None
+
+    async def download_batch_immediately(self, workflows: List[Dict[str, Any]], category_name: str) -> None:
+        """Descarga inmediata de un lote de workflows (varias descargas simultáneas)"""
         if not workflows:
             return
             
         self.log_category(category_name, f"⚡ DESCARGA INMEDIATA: {len(workflows)} workflows")
         
-        batch_size = min(3, len(workflows))
-        tabs = []
+        semaphore = asyncio.Semaphore(self.DOWNLOAD_CONCURRENCY)
+        successes = 0
+        
+        async def download_one(i: int, workflow: Dict[str, Any]) -> None:
+            nonlocal successes
+            async with semaphore:
+                self.log_category(category_name, f"  ⬇️ [{i+1}/{len(workflows)}] Descargando: {workflow['title']}", "DEBUG")
+                ok = await self.download_workflow(workflow)
+            
+            if ok:
+                successes += 1
+                self._stats_counter[(category_name, 'downloaded')] += 1
+                self.log_category(category_name, f"  ✅ ÉXITO: {workflow['slug']}", "DEBUG")
+                if successes % self.PROGRESS_LOG_EVERY == 0:
+                    self.log_category(category_name, f"  ✅ {successes}/{len(workflows)} descargados")
+            else:
+                self._stats_counter[(category_name, 'errors')] += 1
+                self.log_category(category_name, f"  ❌ FALLO: {workflow['slug']}")
         
         try:
-            for i in range(batch_size):
-                tab = context.new_page()
-                tabs.append(tab)
-                time.sleep(0.5)  # Aumentado de 0.3s a 0.5s para estabilidad
-                self.log_category(category_name, f"📄 Pestaña {i+1}/{batch_size} creada")
-            
-            successes = 0
-            for i, workflow in enumerate(workflows):
-                tab_index = i % batch_size
-                self.log_category(category_name, f"  ⬇️ [{i+1}/{len(workflows)}] Descargando: {workflow['title']}")
-                
-                if self.download_workflow_via_clipboard(tabs[tab_index], workflow):
-                    successes += 1
-                    self.global_stats['total_workflows_downloaded'] += 1
-                    if category_name not in self.category_stats:
-                        self.category_stats[category_name] = {'downloaded': 0, 'errors': 0, 'found': 0}
-                    self.category_stats[category_name]['downloaded'] += 1
-                    self.log_category(category_name, f"  ✅ ÉXITO: {workflow['slug']}")
-                else:
-                    self.global_stats['total_errors'] += 1
-                    if category_name not in self.category_stats:
-                        self.category_stats[category_name] = {'downloaded': 0, 'errors': 0, 'found': 0}
-                    self.category_stats[category_name]['errors'] += 1
-                    self.log_category(category_name, f"  ❌ FALLO: {workflow['slug']}")
-                    
-                time.sleep(1.0)  # Aumentado de 0.7s a 1.0s para evitar errores
-                    
+            # El semáforo limita las descargas en vuelo; sin pausas fijas entre workflows
+            await asyncio.gather(*(download_one(i, workflow) for i, workflow in enumerate(workflows)))
         finally:
-            for tab in tabs:
-                try:
-                    tab.close()
-                except:
-                    pass
             self.log_category(category_name, f"⚡ Descarga inmediata completada: {successes}/{len(workflows)} exitosas")
 
-    def scrape_category_workflows(self, context: BrowserContext, category: Dict[str, str], exploration_page: Page = None) -> None:
+    async def scrape_category_workflows(self, browser: Browser, category: Dict[str, str]) -> None:
         """Scraping completo de todos los workflows de una categoría/subcategoría"""
         category_name = category['name']
         self.log_category(category_name, f"🚀 INICIANDO SCRAPING COMPLETO")
         
-        # Inicializar estadísticas de categoría
-        if category_name not in self.category_stats:
-            self.category_stats[category_name] = {'downloaded': 0, 'errors': 0, 'found': 0}
+        # Inicializar estadísticas de categoría (una sola búsqueda para todo el bucle)
+        stats = self.category_stats.setdefault(category_name, {'downloaded': 0, 'errors': 0, 'found': 0})
         
-        # Usar la página de exploración reutilizable si se proporciona, sino crear nueva
-        page = exploration_page if exploration_page else context.new_page()
+        # Contexto y pestaña propios solo si el listado cae al DOM: sin cookies, caché ni
+        # rutas compartidas con las demás subcategorías, que navegan en paralelo
+        dom_context: Optional[BrowserContext] = None
         
         try:
-            # Construir URL con parámetros
-            category_url = f"{category['url']}?count={self.WORKFLOWS_PER_PAGE}"
-            self.log_category(category_name, f"🌐 Navegando a: {category_url}")
-            
-            page.goto(category_url, wait_until="networkidle", timeout=self.TIMEOUT)
-            page.wait_for_timeout(3000)
-            
             all_workflows = []
-            processed_slugs = set()
-            pages_loaded = 0
+            processed_ids = set()
             pending_downloads = []
             
-            while True:
-                pages_loaded += 1
-                self.log_category(category_name, f"📄 Procesando página {pages_loaded}")
+            # Listado por la API de búsqueda (JSON, sin renderizar); si falla se sigue
+            # con la paginación directa por URL (?count=30&page=N) sobre el DOM
+            use_api = True
+            for page_number in range(1, self.MAX_PAGES + 1):
+                self.log_category(category_name, f"📄 Procesando página {page_number}")
                 
-                # Extraer workflows de la página actual
-                page_workflows = self.extract_workflow_links(page, category_name)
+                # Extraer workflows de la página N
+                if use_api:
+                    try:
+                        page_workflows = await self.discover_workflows_via_api(category, page_number)
+                    except Exception as e:
+                        self.log_category(category_name, f"⚠️ Listado por API no disponible ({e}), usando el DOM", "WARNING")
+                        use_api = False
+                if not use_api:
+                    # Las cookies se aceptan en la primera página cargada por DOM (contexto recién creado)
+                    first_dom_page = dom_context is None
+                    try:
+                        if first_dom_page:
+                            dom_context = await self._new_context(browser)
+                            page = await dom_context.new_page()
+                            # Locator de la primera tarjeta: se crea una vez y sirve para todas las páginas
+                            card_locator = page.locator(_WORKFLOW_CARD_SELECTOR).first
+                        page_workflows = await self.fetch_subcategory_page(
+                            page, category, page_number, card_locator, accept_cookies=first_dom_page
+                        )
+                    except Exception as e:
+                        # Terminar el listado sin perder lo ya encontrado: la descarga final sigue
+                        self.log_category(category_name, f"❌ Error cargando la página {page_number} ({e}), terminando el listado", "ERROR")
+                        break
+                if page_workflows is None:
+                    self.log_category(category_name, "🏁 No hay más páginas disponibles")
+                    break
                 
-                new_workflows = 0
-                for workflow in page_workflows:
-                    if (workflow['slug'] not in processed_slugs and 
-                        len(all_workflows) < self.MAX_WORKFLOWS_PER_SUBCATEGORY):
-                        processed_slugs.add(workflow['slug'])
-                        all_workflows.append(workflow)
-                        pending_downloads.append(workflow)
-                        new_workflows += 1
-                        self.global_stats['total_workflows_found'] += 1
-                        self.category_stats[category_name]['found'] += 1
-                        
-                        # Verificar si alcanzamos el límite
-                        if len(all_workflows) >= self.MAX_WORKFLOWS_PER_SUBCATEGORY:
-                            self.log_category(category_name, f"🎯 LÍMITE ALCANZADO: {self.MAX_WORKFLOWS_PER_SUBCATEGORY} workflows")
-                            break
+                # Deduplicar la página completa de una vez (conservando el orden) y
+                # recortar a lo que queda hasta el límite de la subcategoría
+                remaining = self.MAX_WORKFLOWS_PER_SUBCATEGORY - len(all_workflows)
+                new_batch = [w for w in page_workflows if w['id'] not in processed_ids][:remaining]
+                processed_ids.update(w['id'] for w in new_batch)
+                all_workflows.extend(new_batch)
+                pending_downloads.extend(new_batch)
+                
+                new_workflows = len(new_batch)
+                self.global_stats['total_workflows_found'] += new_workflows
+                stats['found'] += new_workflows
+                
+                if len(all_workflows) >= self.MAX_WORKFLOWS_PER_SUBCATEGORY:
+                    self.log_category(category_name, f"🎯 LÍMITE ALCANZADO: {self.MAX_WORKFLOWS_PER_SUBCATEGORY} workflows")
                 
                 self.log_category(category_name, f"📊 Nuevos: {new_workflows} | Total: {len(all_workflows)}/{self.MAX_WORKFLOWS_PER_SUBCATEGORY}")
                 
+                # Página con tarjetas válidas pero todas repetidas: el listado ya no avanza
+                # (una página vacía tras los filtros no cuenta, las siguientes pueden tener más)
+                if page_workflows and new_workflows == 0:
+                    self.log_category(category_name, "🏁 Página sin nuevos workflows, terminando")
+                    break
+                
                 # Verificar si ya alcanzamos el límite
                 if len(all_workflows) >= self.MAX_WORKFLOWS_PER_SUBCATEGORY:
                     break
@@ -691,23 +1153,16 @@ class N8NComprehensiveWorkflowScraper:
                 # Descarga inmediata cada X workflows
                 if len(pending_downloads) >= self.DOWNLOAD_BATCH_SIZE:
                     self.log_category(category_name, f"🚀 DESCARGA INMEDIATA: {len(pending_downloads)} workflows acumulados")
-                    self.download_batch_immediately(context, pending_downloads, category_name)
+                    await self.download_batch_immediately(pending_downloads, category_name)
                     pending_downloads = []
-                
-                # Intentar cargar más páginas
-                if not self.load_more_pages(page, category_name):
-                    self.log_category(category_name, "🏁 No hay más páginas disponibles")
-                    break
-                
+            else:
                 # Límite de seguridad para evitar bucles infinitos
-                if pages_loaded > 30:  # Reducido de 50 a 30
-                    self.log_category(category_name, "⚠️ Límite de páginas alcanzado (30), finalizando")
-                    break
+                self.log_category(category_name, f"⚠️ Límite de páginas alcanzado ({self.MAX_PAGES}), finalizando")
             
             # Descargar workflows restantes
             if pending_downloads:
                 self.log_category(category_name, f"🔚 DESCARGA FINAL: {len(pending_downloads)} workflows restantes")
-                self.download_batch_immediately(context, pending_downloads, category_name)
+                await self.download_batch_immediately(pending_downloads, category_name)
             
             # Mensaje final con razón de terminación
             if len(all_workflows) >= self.MAX_WORKFLOWS_PER_SUBCATEGORY:
@@ -718,34 +1173,44 @@ class N8NComprehensiveWorkflowScraper:
         except Exception as e:
             self.log_category(category_name, f"❌ ERROR en scraping: {e}", "ERROR")
         finally:
-            # Solo cerrar la página si no es la página de exploración reutilizable
-            if not exploration_page:
+            if dom_context is not None:
                 try:
-                    page.close()
+                    await dom_context.close()
                 except:
                     pass
 
+    def _flush_stats_counter(self) -> None:
+        """Vuelca los contadores de descarga en category_stats y global_stats"""
+        for (category_name, metric), count in self._stats_counter.items():
+            stats = self.category_stats.setdefault(category_name, {'downloaded': 0, 'errors': 0, 'found': 0})
+            stats[metric] += count
+            self.global_stats['total_workflows_downloaded' if metric == 'downloaded' else 'total_errors'] += count
+        self._stats_counter.clear()
+
     def print_final_statistics(self) -> None:
         """Imprime estadísticas finales completas"""
+        self._flush_stats_counter()
         duration = time.time() - self.global_stats['start_time']
+        report = self._report_logger.info
         
-        print("\n" + "="*80)
-        print("🎉 SCRAPING MASIVO COMPLETADO - ESTADÍSTICAS FINALES")
-        print("="*80)
+        report("\n" + "="*80)
+        report("🎉 SCRAPING MASIVO COMPLETADO - ESTADÍSTICAS FINALES")
+        report("="*80)
         
-        print(f"⏱️  Duración total: {duration:.2f} segundos ({duration/60:.1f} minutos)")
-        print(f"📂 Categorías exploradas: {self.global_stats['categories_explored']}")
-        print(f"📁 Subcategorías exploradas: {self.global_stats['subcategories_explored']}")
-        print(f"🔍 Total workflows encontrados: {self.global_stats['total_workflows_found']}")
-        print(f"⬇️  Total workflows descargados: {self.global_stats['total_workflows_downloaded']}")
-        print(f"❌ Total errores: {self.global_stats['total_errors']}")
+        report(f"⏱️  Duración total: {duration:.2f} segundos ({duration/60:.1f} minutos)")
+        report(f"📂 Categorías exploradas: {self.global_stats['categories_explored']}")
+        report(f"📁 Subcategorías exploradas: {self.global_stats['subcategories_explored']}")
+        report(f"🔍 Total workflows encontrados: {self.global_stats['total_workflows_found']}")
+        report(f"⬇️  Total workflows descargados: {self.global_stats['total_workflows_downloaded']}")
+        report(f"❌ Total errores: {self.global_stats['total_errors']}")
+        report(f"💾 Ya descargados (caché): {self.global_stats['cache_hits']}")
         
         if self.global_stats['total_workflows_found'] > 0:
             success_rate = (self.global_stats['total_workflows_downloaded'] / self.global_stats['total_workflows_found']) * 100
-            print(f"✅ Tasa de éxito: {success_rate:.1f}%")
+            report(f"✅ Tasa de éxito: {success_rate:.1f}%")
         
-        print("\n📊 ESTADÍSTICAS POR CATEGORÍA:")
-        print("-"*80)
+        report("\n📊 ESTADÍSTICAS POR CATEGORÍA:")
+        report("-"*80)
         
         for category, stats in self.category_stats.items():
             found = stats.get('found', 0)
@@ -753,18 +1218,52 @@ class N8NComprehensiveWorkflowScraper:
             errors = stats.get('errors', 0)
             rate = (downloaded / found * 100) if found > 0 else 0
             
-            print(f"📁 {category:<20} | Encontrados: {found:>4} | Descargados: {downloaded:>4} | Errores: {errors:>3} | Éxito: {rate:>5.1f}%")
+            report(f"📁 {category:<20} | Encontrados: {found:>4} | Descargados: {downloaded:>4} | Errores: {errors:>3} | Éxito: {rate:>5.1f}%")
+        
+        report("\n💾 Archivos guardados en:")
+        report(f"   {self.download_dir.absolute()}")
         
-        print("\n💾 Archivos guardados en:")
-        print(f"   {self.download_dir.absolute()}")
+        report("\n🗂️  Estructura de directorios:")
+        # os.scandir: el tipo de entrada viene del propio readdir (sin stat ni fnmatch por archivo)
+        # El directorio de logs vive en download_dir pero no es una categoría
+        log_dir_name = pathlib.PurePath(self.LOG_FILE).parts[0]
+        with os.scandir(self.download_dir) as entries:
+            category_dirs = sorted((entry for entry in entries if entry.is_dir() and entry.name != log_dir_name),
+                                   key=lambda entry: entry.name)
+        for category_dir in category_dirs:
+            with os.scandir(category_dir.path) as entries:
+                file_count = sum(1 for entry in entries if entry.name.endswith('.json'))
+            report(f"   📁 {category_dir.name}/ ({file_count} archivos)")
+
+    async def _launch_browser(self, p) -> Tuple[Browser, BrowserContext]:
+        """Lanza un navegador Chromium con su contexto configurado"""
+        browser = await p.chromium.launch(
+            headless=False,
+            slow_mo=self.SLOW_MO,
+            args=['--disable-blink-features=AutomationControlled']
+        )
         
-        print("\n🗂️  Estructura de directorios:")
-        for category_dir in sorted(self.download_dir.iterdir()):
-            if category_dir.is_dir():
-                file_count = len(list(category_dir.glob('*.json')))
-                print(f"   📁 {category_dir.name}/ ({file_count} archivos)")
+        return browser, await self._new_context(browser)
 
-    def scrape_all_categories_comprehensively(self) -> None:
+    async def _new_context(self, browser: Browser) -> BrowserContext:
+        """Crea un contexto aislado (cookies, caché, rutas) sobre el navegador compartido"""
+        # Reutilizar cookies ya aceptadas (en esta ejecución o en anteriores)
+        context = await browser.new_context(user_agent=self.USER_AGENT, storage_state=self._storage_state)
+        await context.route("**/*", self._block_heavy_resources)
+        return context
+
+    async def _block_heavy_resources(self, route) -> None:
+        """Aborta las peticiones que el scraper no necesita (imágenes, fuentes, analítica...)"""
+        request = route.request
+        # La navegación principal nunca se aborta, aunque su URL se parezca a un rastreador
+        if request.resource_type != "document" and (
+                request.resource_type in self.BLOCKED_RESOURCE_TYPES or
+                self._BLOCKED_HOST_RE.search(urlparse(request.url).hostname or "")):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def scrape_all_categories_comprehensively(self) -> None:
         """Proceso principal: scraping masivo de todas las categorías y subcategorías"""
         self.log("🚀 INICIANDO N8N COMPREHENSIVE WORKFLOW SCRAPER V3.0")
         self.log("🌍 EXPLORACIÓN MASIVA DE TODAS LAS CATEGORÍAS")
@@ -773,73 +1272,126 @@ class N8NComprehensiveWorkflowScraper:
         self.log(f"⚡ Descarga cada: {self.DOWNLOAD_BATCH_SIZE} workflows")
         self.log("="*80)
         
-        with sync_playwright() as p:
-            browser = p.chromium.launch(
-                headless=False,
-                slow_mo=self.SLOW_MO,
-                args=['--disable-blink-features=AutomationControlled']
-            )
-            
-            context = browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+        try:
+            self.http = aiohttp.ClientSession(
+                headers={'User-Agent': self.USER_AGENT},
+                timeout=aiohttp.ClientTimeout(total=self.TIMEOUT / 1000),
+                connector=aiohttp.TCPConnector(limit=self.HTTP_MAX_CONNECTIONS)
             )
+            async with async_playwright() as p:
+                browser, context = await self._launch_browser(p)
+                try:
+                    await self._run_phases(browser, context)
+                finally:
+                    try:
+                        await browser.close()
+                    except:
+                        pass
             
-            page = context.new_page()
+        except Exception as e:
+            self.log(f"❌ ERROR CRÍTICO en scraping masivo: {e}", "ERROR")
+        finally:
+            if self.http is not None:
+                await self.http.close()
             
+            self._close_logging()
+
+    async def _run_phases(self, browser: Browser, context: BrowserContext) -> None:
+        """Fases del scraping sobre un único navegador; `context` es el compartido para
+        el descubrimiento y las pestañas de descarga"""
+        # FASE 1: Descubrir todas las categorías principales y sus subcategorías
+        self.log("🗺️  FASE 1: Descubriendo categorías principales...")
+        
+        if self.USE_HARDCODED_CATEGORIES or self._categories_cache:
+            # Categorías ya conocidas: no hace falta abrir ninguna pestaña
+            main_categories = await self.discover_main_categories()
+        else:
+            page = await context.new_page()
             try:
-                # FASE 1: Descubrir todas las categorías principales
-                self.log("🗺️  FASE 1: Descubriendo categorías principales...")
-                main_categories = self.discover_main_categories(page)
-                
-                if not main_categories:
-                    self.log("❌ No se pudieron descubrir categorías principales", "ERROR")
-                    return
-                
-                self.global_stats['categories_explored'] = len(main_categories)
-                
-                # FASE 2: Para cada categoría principal, explorar subcategorías y scrape
-                for i, category in enumerate(main_categories):
-                    self.log(f"\n🎯 [{i+1}/{len(main_categories)}] PROCESANDO CATEGORÍA: {category['name']}")
-                    
-                    # Buscar subcategorías
-                    subcategories = self.discover_subcategories(page, category)
-                    
-                    if subcategories:
-                        # Tiene subcategorías - procesarlas individualmente
-                        self.global_stats['subcategories_explored'] += len(subcategories)
-                        
-                        for j, subcat in enumerate(subcategories):
-                            self.log(f"  📂 [{j+1}/{len(subcategories)}] Subcategoría: {subcat['name']}")
-                            self.scrape_category_workflows(context, subcat, page)  # Reutilizar la misma pestaña
-                            
-                            # Pausa pequeña entre subcategorías
-                            if j < len(subcategories) - 1:
-                                self.log(f"⏳ Pausa de 3 segundos antes de la siguiente subcategoría...")
-                                time.sleep(3)
-                    else:
-                        # No tiene subcategorías - procesar la categoría directamente
-                        self.scrape_category_workflows(context, category, page)  # Reutilizar la misma pestaña
-                    
-                    # Pausa entre categorías principales (reducida)
-                    if i < len(main_categories) - 1:
-                        self.log("⏳ Pausa de 5 segundos antes de la siguiente categoría...")
-                        time.sleep(5)  # Reducido de 10 a 5 segundos
-                
-                # FASE 3: Estadísticas finales
-                self.print_final_statistics()
-                
-            except Exception as e:
-                self.log(f"❌ ERROR CRÍTICO en scraping masivo: {e}", "ERROR")
+                main_categories = await self.discover_main_categories(page)
             finally:
                 try:
-                    browser.close()
+                    await page.close()
                 except:
                     pass
-
+        
+        if not main_categories:
+            self.log("❌ No se pudieron descubrir categorías principales", "ERROR")
+            return
+        
+        self.global_stats['categories_explored'] = len(main_categories)
+        
+        targets = []
+        for i, category in enumerate(main_categories):
+            self.log(f"\n🎯 [{i+1}/{len(main_categories)}] PROCESANDO CATEGORÍA: {category['name']}")
+            
+            # Buscar subcategorías
+            subcategories = self.discover_subcategories(category)
+            
+            if subcategories:
+                # Tiene subcategorías - procesarlas individualmente
+                self.global_stats['subcategories_explored'] += len(subcategories)
+                targets.extend(subcategories)
+            else:
+                # No tiene subcategorías - procesar la categoría directamente
+                targets.append(category)
+        
+        # FASE 2: Procesar subcategorías en paralelo, como mucho CATEGORY_CONCURRENCY a la vez
+        self.log(f"⚡ FASE 2: Procesando {len(targets)} subcategorías con {self.CATEGORY_CONCURRENCY} en paralelo")
+        semaphore = asyncio.Semaphore(self.CATEGORY_CONCURRENCY)
+        
+        async def scrape_target(target: Dict[str, str]) -> None:
+            async with semaphore:
+                self.log(f"  📂 Subcategoría: {target['name']}")
+                await self.scrape_category_workflows(browser, target)
+        
+        # Pool de pestañas de descarga: se crean una sola vez y se prestan por workflow
+        self.tab_pool = asyncio.Queue()
+        self._pool_cookies_lock = asyncio.Lock()
+        download_tabs = [await context.new_page() for _ in range(self.TAB_POOL_SIZE)]
+        for tab in download_tabs:
+            self.tab_pool.put_nowait(tab)
+        
+        try:
+            results = await asyncio.gather(*(scrape_target(target) for target in targets), return_exceptions=True)
+            for target, result in zip(targets, results):
+                if isinstance(result, Exception):
+                    self.log_category(target['name'], f"❌ ERROR en subcategoría: {result}", "ERROR")
+        finally:
+            for page in download_tabs:
+                try:
+                    await page.close()
+                except:
+                    pass
+        
+        # Esperar a que el hilo escritor termine de guardar todos los workflows
+        await asyncio.get_running_loop().run_in_executor(None, self._write_queue.join)
+        
+        # FASE 3: Estadísticas finales
+        self.print_final_statistics()
 
 def main():
-    scraper = N8NComprehensiveWorkflowScraper()
-    scraper.scrape_all_categories_comprehensively()
+    parser = argparse.ArgumentParser(description="N8N comprehensive workflow scraper")
+    parser.add_argument("--force-rescrape", action="store_true",
+                        help="Volver a descargar workflows aunque ya existan en disco")
+    args = parser.parse_args()
+    
+    # Límite de peticiones por segundo y host (N8N_RPS); se valida antes de arrancar nada
+    raw_rps = os.environ.get("N8N_RPS")
+    requests_per_second = None
+    if raw_rps is not None:
+        try:
+            requests_per_second = float(raw_rps)
+        except ValueError:
+            parser.error(f"N8N_RPS debe ser un número (recibido: {raw_rps!r})")
+    
+    # El rango (finito y mayor que 0) lo valida el constructor
+    try:
+        scraper = N8NComprehensiveWorkflowScraper(force_rescrape=args.force_rescrape,
+                                                  requests_per_second=requests_per_second)
+    except ValueError as e:
+        parser.error(f"N8N_RPS no válido: {e}")
+    asyncio.run(scraper.scrape_all_categories_comprehensively())
 
 
 if __name__ == "__main__":